@@ -1,32 +1,68 @@
-import os, asyncio, logging, json
+import os, asyncio, logging, time, uuid
+from contextlib import asynccontextmanager
 from typing import Dict, Any
 from strands import Agent
 from strands.models.bedrock import BedrockModel
 from bedrock_agentcore import BedrockAgentCoreApp
-import boto3
+import orjson
 
-from tools import http_get, sleep_seconds, current_time, update_next_schedule
+from aws_clients import get_client, close_clients
+from tools import http_get, sleep_seconds, current_time, update_next_schedule, close_http_client
 
 from bedrock_agentcore.memory.integrations.strands.config import AgentCoreMemoryConfig, RetrievalConfig
 from bedrock_agentcore.memory.integrations.strands.session_manager import AgentCoreMemorySessionManager
 
 
+# ルートロガーは設定せず、このモジュールのロガーだけを INFO にする
 log = logging.getLogger("AsyncAgent")
-logging.basicConfig(level=logging.INFO)
+log.setLevel(logging.INFO)
+if not logging.getLogger().handlers:
+    # ホスト側でロギングが未設定の場合のみ、自前のハンドラーで出力する
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    log.addHandler(_log_handler)
 
-# SNSクライアントの初期化
-sns_client = boto3.client('sns')
+# ジョブを実行するイベントループ（BedrockAgentCoreApp のワーカーループ）
+_job_loop: asyncio.AbstractEventLoop | None = None
 
-app = BedrockAgentCoreApp()
+
+@asynccontextmanager
+async def _lifespan(app):
+    """シャットダウン時に、ジョブ用ループ上の通知キューとクライアントを後始末する"""
+    yield
+    if _job_loop is None or not _job_loop.is_running():
+        return
+    try:
+        cleanup = asyncio.run_coroutine_threadsafe(_shutdown_job_resources(), _job_loop)
+        await asyncio.wait_for(asyncio.wrap_future(cleanup), timeout=5)
+    except Exception as e:
+        log.warning("[AsyncAgent] シャットダウン時の後始末に失敗: %s", e)
+
+
+async def _shutdown_job_resources():
+    """ジョブ用ループに紐づくリソースを閉じる"""
+    await _shutdown_sns()
+    await close_clients()
+    await close_http_client()
+
+
+app = BedrockAgentCoreApp(lifespan=_lifespan)
 
 MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "jp.anthropic.claude-haiku-4-5-20251001-v1:0")
 model = BedrockModel(model_id=MODEL_ID, streaming=False)
 
-# AgentCore Memory 設定（環境変数から取得、デフォルト値あり）
-MEMORY_ID = os.environ.get("AGENTCORE_MEMORY_ID")
+# AgentCore Memory 設定（環境変数から取得）
+# メモリーID・ストラテジーIDは必須。未設定のままだと "/strategies/None/..." で毎回失敗する検索が走るため、
+# 起動時に検証して RuntimeError にする。セッションID・アクターIDはデフォルト値あり
+_REQUIRED_ENV = ["AGENTCORE_MEMORY_ID", "AGENTCORE_MEMORY_STRATEGY_ID"]
+_missing_env = [k for k in _REQUIRED_ENV if not os.environ.get(k)]
+if _missing_env:
+    raise RuntimeError(f"missing env: {_missing_env}")
+
+MEMORY_ID = os.environ["AGENTCORE_MEMORY_ID"]
 SESSION_ID = os.environ.get("AGENTCORE_SESSION_ID", "scheduled_agent_session")
 ACTOR_ID = os.environ.get("AGENTCORE_ACTOR_ID", "async_agent")
-MEMORY_STRATEGY_ID = os.environ.get("AGENTCORE_MEMORY_STRATEGY_ID")
+MEMORY_STRATEGY_ID = os.environ["AGENTCORE_MEMORY_STRATEGY_ID"]
 
 SYSTEM_PROMPT = (
     "You are a pragmatic research agent that runs on a schedule.\n\n"
@@ -55,29 +91,128 @@ SYSTEM_PROMPT = (
     "- next_input: 'これはN回目の実行です。' (where N is the next execution number)\n"
 )
 
+# summary strategyから前回の実行要約を取得する検索キー
+_RETRIEVAL_KEY = f"/strategies/{MEMORY_STRATEGY_ID}/actors/{ACTOR_ID}/sessions/{SESSION_ID}"
+
 # メモリー設定を作成（環境変数から取得した値を使用）
 memory_config = AgentCoreMemoryConfig(
     memory_id=MEMORY_ID,
     session_id=SESSION_ID,  # 固定値: すべての実行を同じ会話として扱う
     actor_id=ACTOR_ID,      # 固定値: エージェント自体が唯一のアクター
-    retrieval_config={
-        # summary strategyから前回の実行要約を取得
-        f"/strategies/{MEMORY_STRATEGY_ID}/actors/{ACTOR_ID}/sessions/{SESSION_ID}":
-            RetrievalConfig(top_k=5, relevance_score=0.3)
-    }
+    retrieval_config={_RETRIEVAL_KEY: RetrievalConfig(top_k=5, relevance_score=0.3)}
 )
 
-# セッションマネージャーを作成
-session_manager = AgentCoreMemorySessionManager(
-    agentcore_memory_config=memory_config
-)
+AGENT_TOOLS = (http_get, sleep_seconds, current_time, update_next_schedule)
+
+# エージェントは初回実行時に一度だけ生成し、以降のウォーム呼び出しで再利用する
+_agent: Agent | None = None
+_agent_init_lock = asyncio.Lock()
+
+
+async def _get_agent() -> Agent:
+    """エージェントのシングルトンを取得する（同時の初回リクエストでも生成は1回だけ）"""
+    global _agent
+    if _agent is None:
+        async with _agent_init_lock:
+            if _agent is None:
+                # セッションマネージャーを作成（app.state に保持して再利用）
+                app.state.session_manager = AgentCoreMemorySessionManager(
+                    agentcore_memory_config=memory_config
+                )
+                _agent = Agent(
+                    model=model,
+                    tools=AGENT_TOOLS,
+                    system_prompt=SYSTEM_PROMPT,
+                    session_manager=app.state.session_manager
+                )
+    return _agent
+
+# --- SNS通知のバッチ送信 ---
+SNS_BATCH_SIZE = 10          # PublishBatch の1回あたりの最大エントリ数
+SNS_BATCH_LINGER_SEC = 0.2   # 最初のエントリ到着後、後続を待つ最大時間
+SNS_RESULT_MAX_BYTES = 3000  # 通知に含める実行結果の最大バイト数（UTF-8）
+SNS_PUBLISH_TIMEOUT_SEC = 30  # 1件の通知の送信完了を待つ最大時間
+
+# キューとフラッシャーはジョブと同じイベントループ上で遅延生成する
+# キューの要素: (TopicArn, PublishBatchRequestEntry, 送信結果を受け取る Future)
+_sns_queue: asyncio.Queue | None = None
+_sns_flusher_task: asyncio.Task | None = None
+# 送信結果待ちの Future（シャットダウン時に失敗させる）
+_sns_pending: set[asyncio.Future] = set()
+
+
+def _ensure_sns_flusher() -> asyncio.Queue:
+    """送信キューとフラッシャーを現在のループ上で用意する（停止していれば作り直す）"""
+    global _sns_queue, _sns_flusher_task
+    if _sns_flusher_task is None or _sns_flusher_task.done():
+        _sns_queue = asyncio.Queue()
+        _sns_flusher_task = asyncio.create_task(_sns_flusher(_sns_queue))
+    return _sns_queue
+
+
+async def _publish_sns_batch(batch: list):
+    """溜まったエントリを TopicArn ごとに PublishBatch で送信し、各 Future を解決する"""
+    by_topic: Dict[str, list] = {}
+    for topic_arn, entry, future in batch:
+        by_topic.setdefault(topic_arn, []).append((entry, future))
+
+    for topic_arn, items in by_topic.items():
+        futures = {entry["Id"]: future for entry, future in items}
+        try:
+            # クライアントはジョブと同じイベントループ上で初回利用時に生成する
+            sns_client = await get_client("sns")
+            response = await sns_client.publish_batch(
+                TopicArn=topic_arn,
+                PublishBatchRequestEntries=[entry for entry, _ in items]
+            )
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for ok in response.get("Successful", []):
+            future = futures[ok["Id"]]
+            if not future.done():
+                future.set_result(ok["MessageId"])
+        for ng in response.get("Failed", []):
+            future = futures[ng["Id"]]
+            if not future.done():
+                future.set_exception(RuntimeError(f"{ng['Code']}: {ng.get('Message')}"))
+
+
+async def _sns_flusher(queue: asyncio.Queue):
+    """キューからエントリを取り出し、10件溜まるか待機時間が過ぎたらまとめて送信する"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + SNS_BATCH_LINGER_SEC
+        while len(batch) < SNS_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await _publish_sns_batch(batch)
+        except Exception as e:
+            # 想定外のエラーでもフラッシャーは止めず、このバッチの待ち手だけを失敗させる
+            log.error("[SNS] バッチ送信で予期しないエラー: %s", e)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+async def _shutdown_sns():
+    """フラッシャーを止め、未送信の通知の待ち手を失敗させる（ジョブのループ上で呼び出す）"""
+    if _sns_flusher_task is not None:
+        _sns_flusher_task.cancel()
+    for future in list(_sns_pending):
+        if not future.done():
+            future.set_exception(RuntimeError("SNS notifier is shutting down"))
 
-agent = Agent(
-    model=model,
-    tools=[http_get, sleep_seconds, current_time, update_next_schedule],
-    system_prompt=SYSTEM_PROMPT,
-    session_manager=session_manager
-)
 
 # --- SNS通知送信関数 ---
 async def send_sns_notification(job_id: str, status: str, message: str, result: Any = None):
@@ -101,31 +236,46 @@ async def send_sns_notification(job_id: str, status: str, message: str, result:
             "job_id": job_id,
             "status": status,
             "message": message,
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": time.time()
         }
 
         if result:
-            # 結果が長すぎる場合は切り詰める
+            # 結果が長すぎる場合はUTF-8のバイト数で切り詰める（日本語でもメッセージサイズを一定に保つ）
             result_str = str(result)
-            if len(result_str) > 1000:
-                result_str = result_str[:1000] + "...(truncated)"
+            result_bytes = result_str.encode()
+            if len(result_bytes) > SNS_RESULT_MAX_BYTES:
+                result_str = result_bytes[:SNS_RESULT_MAX_BYTES].decode(errors="ignore") + "...(truncated)"
             notification_data["result"] = result_str
 
-        # SNS通知を非同期で送信（スレッドプールで実行）
-        await asyncio.to_thread(
-            sns_client.publish,
-            TopicArn=topic_arn,
-            Subject=f"AgentCore Job {status.upper()}: {job_id}",
-            Message=json.dumps(notification_data, indent=2, ensure_ascii=False)
-        )
+        # バッチ送信キューに積み、PublishBatch の結果を待つ
+        entry = {
+            "Id": uuid.uuid4().hex,
+            "Subject": f"AgentCore Job {status.upper()}: {job_id}",
+            "Message": orjson.dumps(notification_data).decode()
+        }
+        queue = _ensure_sns_flusher()
+        future = asyncio.get_running_loop().create_future()
+        _sns_pending.add(future)
+        future.add_done_callback(_sns_pending.discard)
+        queue.put_nowait((topic_arn, entry, future))
+        # 送信が止まってもジョブ（とセマフォの枠）を握り続けないよう上限を設ける
+        await asyncio.wait_for(future, timeout=SNS_PUBLISH_TIMEOUT_SEC)
 
         log.info("[SNS] 通知送信完了: job=%s, status=%s", job_id, status)
 
     except Exception as e:
-        log.error("[SNS] 通知送信失敗: %s", e)
+        log.error("[SNS] 通知送信失敗: %s: %s", type(e).__name__, e)
         # 通知失敗はエージェント処理の成功/失敗には影響させない
 
 # --- 裏で回る本処理（invoke_async でネイティブに実行）---
+# バックグラウンドジョブは1件ずつ実行する
+# （全ジョブが同じ Agent と固定のメモリーセッションを共有しており、
+#  strands の Agent は同時呼び出しを ConcurrencyException で拒否するため）
+JOB_SEM = asyncio.Semaphore(1)
+
+# 1ジョブあたりのエージェント実行タイムアウト（秒）
+AGENT_TIMEOUT_S = int(os.environ.get("AGENT_TIMEOUT_S", "600"))
+
 async def _background_run(task_id: int, payload: Dict[str, Any], context):
     job_id = payload.get("job_id", "mvp")
     result = None
@@ -139,18 +289,35 @@ async def _background_run(task_id: int, payload: Dict[str, Any], context):
         user_input = payload.get("input") or "Say hello and show current_time."
         log.info("[AsyncAgent(SDK)] job=%s | start background | input=%s", job_id, user_input)
 
-        # --- ここが変更点：to_thread → invoke_async（非同期ネイティブ） ---
-        # タイムアウトを付けたい場合は wait_for(...) でラップ
-        result = await agent.invoke_async(user_input)  # ← await で完了まで非ブロッキングに待つ
-        log.info("[AsyncAgent] job=%s | completed | result=%s", job_id, str(result)[:1000])
+        # ジョブを直列化（エントリポイントは即レスし、LLM実行だけをゲートする）
+        async with JOB_SEM:
+            # --- ここが変更点：to_thread → invoke_async（非同期ネイティブ） ---
+            agent = await _get_agent()
+            try:
+                # ハングしたジョブがタスクを握り続けないようタイムアウトを付ける
+                async with asyncio.timeout(AGENT_TIMEOUT_S) as deadline:
+                    result = await agent.invoke_async(user_input)
+            except TimeoutError:
+                # invoke_async 内部で発生したタイムアウト（HTTP の読み取りタイムアウト等）は通常のエラーとして扱う
+                if not deadline.expired():
+                    raise
+                log.error("[AsyncAgent] job=%s | timed out after %ss", job_id, AGENT_TIMEOUT_S)
+                await send_sns_notification(
+                    job_id=job_id,
+                    status="error",
+                    message=f"エージェント処理がタイムアウトしました（{AGENT_TIMEOUT_S}秒）"
+                )
+                return
+            if log.isEnabledFor(logging.INFO):
+                log.info("[AsyncAgent] job=%s | completed | result=%s", job_id, str(result)[:1000])
 
-        # エージェント処理成功後にSNS通知を送信
-        await send_sns_notification(
-            job_id=job_id,
-            status="success",
-            message="エージェント処理が正常に完了しました",
-            result=result
-        )
+            # エージェント処理成功後にSNS通知を送信
+            await send_sns_notification(
+                job_id=job_id,
+                status="success",
+                message="エージェント処理が正常に完了しました",
+                result=result
+            )
 
     except Exception as e:
         log.exception("[AsyncAgent(SDK)] job failed: %s", e)
@@ -167,13 +334,28 @@ async def _background_run(task_id: int, payload: Dict[str, Any], context):
         log.info("[AsyncAgent] job=%s | task completed and session released", job_id)
 
 # --- 即レスするエントリポイント ---
+# 実行中のバックグラウンドタスクへの強参照（完了前にGCで回収されるのを防ぐ）
+_BG_TASKS: set[asyncio.Task] = set()
+
 @app.entrypoint
 async def main(payload: Dict[str, Any], context=None):
+    global _job_loop
     if payload.get("action") == "start":
+        _job_loop = asyncio.get_running_loop()
         task_id = app.add_async_task("agent_job", {"job_id": payload.get("job_id")})
-        asyncio.create_task(_background_run(task_id, payload, context))
+        t = asyncio.create_task(_background_run(task_id, payload, context))
+        _BG_TASKS.add(t)
+        t.add_done_callback(_BG_TASKS.discard)
         return {"status": "started", "task_id": task_id}
     return {"status": "noop"}
 
 if __name__ == "__main__":
+    # ジョブは AgentCore のワーカーループ（asyncio.new_event_loop() で生成）上で動くため、
+    # uvicorn の loop 設定ではなくイベントループポリシーで uvloop を有効にする
+    # （uvloop が使えない環境では標準の asyncio のまま）
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     app.run()
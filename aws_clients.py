@@ -0,0 +1,62 @@
+import asyncio
+from contextlib import AsyncExitStack
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+
+# すべての AWS クライアントで共有する設定（スロットリング時はアダプティブリトライ）
+_CFG = AioConfig(
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True,
+    max_pool_connections=50
+)
+
+# 共有セッション（認証情報の解決・更新を一度で済ませる）
+_S = get_session()
+
+# 生成済みクライアント（サービス名 → クライアント）
+# aiobotocore のクライアントと asyncio.Lock は生成したイベントループに紐づくため、
+# すべてジョブを実行するループ（AgentCore のワーカーループ）上で生成・利用する
+_clients: dict = {}
+_exit_stack = AsyncExitStack()
+_lock: asyncio.Lock | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _bind_loop():
+    """クライアントとロックを現在のループに紐づける（ループが変わっていれば作り直す）"""
+    global _exit_stack, _lock, _loop
+    loop = asyncio.get_running_loop()
+    if loop is not _loop:
+        # 別ループで生成したクライアントはこのループから使えない・閉じられないため破棄する
+        _clients.clear()
+        _exit_stack = AsyncExitStack()
+        _lock = asyncio.Lock()
+        _loop = loop
+
+
+async def get_client(service_name: str):
+    """共有セッションから非同期クライアントを取得する（初回のみ生成し、以降は再利用）
+
+    Args:
+        service_name: AWS サービス名 (例: 'sns', 'scheduler')
+
+    Returns:
+        aiobotocore の非同期クライアント
+    """
+    _bind_loop()
+    client = _clients.get(service_name)
+    if client is None:
+        async with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = await _exit_stack.enter_async_context(
+                    _S.create_client(service_name, config=_CFG)
+                )
+                _clients[service_name] = client
+    return client
+
+
+async def close_clients():
+    """生成済みのクライアントをすべて閉じる（アプリのシャットダウン時に呼び出す）"""
+    _clients.clear()
+    await _exit_stack.aclose()
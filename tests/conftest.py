@@ -0,0 +1,10 @@
+import os
+import sys
+
+# リポジトリ直下のモジュール（async_agent, tools 等）を import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# async_agent の import 時に必須の環境変数（AWS への通信は各テストでフェイクに差し替える）
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-1")
+os.environ.setdefault("AGENTCORE_MEMORY_ID", "test-memory")
+os.environ.setdefault("AGENTCORE_MEMORY_STRATEGY_ID", "test-strategy")
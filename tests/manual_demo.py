@@ -23,4 +23,5 @@ async def main():
         demo(),
     )
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
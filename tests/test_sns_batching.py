@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+import async_agent
+
+TOPIC_ARN = "arn:aws:sns:ap-northeast-1:123456789012:test-topic"
+
+
+class FakeSNS:
+    """publish_batch の呼び出しを記録するフェイクの SNS クライアント"""
+
+    def __init__(self, fail_job_ids=(), hang=False):
+        self.batches = []
+        self.fail_job_ids = set(fail_job_ids)
+        self.hang = hang
+
+    async def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        if self.hang:
+            await asyncio.Event().wait()
+        self.batches.append(PublishBatchRequestEntries)
+        ok, ng = [], []
+        for entry in PublishBatchRequestEntries:
+            if any(job_id in entry["Subject"] for job_id in self.fail_job_ids):
+                ng.append({"Id": entry["Id"], "Code": "InternalError", "Message": "boom", "SenderFault": False})
+            else:
+                ok.append({"Id": entry["Id"], "MessageId": f"msg-{entry['Id']}"})
+        return {"Successful": ok, "Failed": ng}
+
+
+@pytest.fixture
+def fake_sns(monkeypatch):
+    def install(**kwargs):
+        sns = FakeSNS(**kwargs)
+
+        async def get_client(service_name):
+            assert service_name == "sns"
+            return sns
+
+        monkeypatch.setattr(async_agent, "get_client", get_client)
+        return sns
+
+    monkeypatch.setenv("SNS_TOPIC_ARN", TOPIC_ARN)
+    # テストごとに新しいループ上でキューとフラッシャーを作り直す
+    monkeypatch.setattr(async_agent, "_sns_queue", None)
+    monkeypatch.setattr(async_agent, "_sns_flusher_task", None)
+    return install
+
+
+def test_burst_is_split_into_batches_of_ten(fake_sns):
+    sns = fake_sns()
+
+    async def run():
+        await asyncio.gather(*(
+            async_agent.send_sns_notification(job_id=f"job{i}", status="success", message="ok")
+            for i in range(13)
+        ))
+
+    asyncio.run(run())
+
+    assert [len(batch) for batch in sns.batches] == [10, 3]
+
+
+def test_failed_entries_become_exceptions(fake_sns):
+    fake_sns(fail_job_ids=["job-bad"])
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        batch = []
+        for job_id in ("job-ok", "job-bad"):
+            entry = {"Id": job_id, "Subject": f"AgentCore Job SUCCESS: {job_id}", "Message": "{}"}
+            batch.append((TOPIC_ARN, entry, loop.create_future()))
+        await async_agent._publish_sns_batch(batch)
+        return [future for _, _, future in batch]
+
+    ok, bad = asyncio.run(run())
+
+    assert ok.result() == "msg-job-ok"
+    with pytest.raises(RuntimeError, match="InternalError: boom"):
+        bad.result()
+
+
+def test_hanging_publish_is_cut_off_by_timeout(fake_sns, monkeypatch, caplog):
+    fake_sns(hang=True)
+    monkeypatch.setattr(async_agent, "SNS_PUBLISH_TIMEOUT_SEC", 0.2)
+
+    async def run():
+        await async_agent.send_sns_notification(job_id="job-hang", status="success", message="ok")
+
+    started = time.monotonic()
+    with caplog.at_level(logging.ERROR, logger="AsyncAgent"):
+        asyncio.run(run())
+
+    assert time.monotonic() - started < 2
+    assert "通知送信失敗: TimeoutError" in caplog.text
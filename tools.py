@@ -1,16 +1,42 @@
 from strands import tool
 import asyncio
-import boto3
-import json
+from botocore.exceptions import ClientError
+import orjson
 import os
-import re
 from datetime import datetime, timedelta
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 import httpx
 from typing import Optional
 
-# EventBridge Scheduler クライアントの初期化
-scheduler_client = boto3.client('scheduler')
+from aws_clients import get_client
+
+# get_schedule の結果キャッシュ: (schedule_name, group_name) → スケジュール設定
+_SCHED_CACHE: dict[tuple, dict] = {}
+
+# キャッシュを破棄して取得し直すべきエラーコード
+_SCHED_STALE_CODES = ('ResourceNotFoundException', 'ConflictException')
+
+# http_get で共有する HTTP クライアント（コネクションプールを呼び出し間で再利用、同一ホストへは HTTP/2 で多重化）
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=10,
+    follow_redirects=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    headers={"User-Agent": "AgentCore-Strands-MVP/1.0"}
+)
+
+
+# タイムゾーンオブジェクトのキャッシュ
+_zi = lru_cache(maxsize=16)(ZoneInfo)
+
+# 相対時間表記の単位 → 秒数
+_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+
+async def close_http_client():
+    """共有 HTTP クライアントを閉じる（アプリのシャットダウン時に呼び出す）"""
+    await _HTTP.aclose()
 
 
 def _parse_relative_time(relative_str: str) -> timedelta:
@@ -22,25 +48,16 @@ def _parse_relative_time(relative_str: str) -> timedelta:
     Returns:
         timedelta オブジェクト
     """
-    match = re.match(r'\+(\d+)([mhd])', relative_str.lower())
-    if not match:
+    value = relative_str[1:-1]
+    mult = _UNITS.get(relative_str[-1:].lower())
+    if relative_str[:1] != '+' or mult is None or not value.isdecimal():
         raise ValueError(f"Invalid relative time format: {relative_str}. Use '+30m', '+2h', '+1d' etc.")
 
-    value = int(match.group(1))
-    unit = match.group(2)
-
-    if unit == 'm':
-        return timedelta(minutes=value)
-    elif unit == 'h':
-        return timedelta(hours=value)
-    elif unit == 'd':
-        return timedelta(days=value)
-    else:
-        raise ValueError(f"Unknown time unit: {unit}")
+    return timedelta(seconds=int(value) * mult)
 
 
-def _update_schedule_sync(next_datetime: datetime, timezone: str, next_input: str = None) -> dict:
-    """get_schedule → update_schedule を同期的に実行
+async def _update_schedule(next_datetime: datetime, timezone: str, next_input: str = None) -> dict:
+    """get_schedule → update_schedule を非同期に実行（get_schedule の結果はキャッシュする）
 
     Args:
         next_datetime: 次回実行日時
@@ -56,46 +73,66 @@ def _update_schedule_sync(next_datetime: datetime, timezone: str, next_input: st
     if not schedule_name:
         raise ValueError("SCHEDULE_NAME environment variable is not set")
 
-    # 既存のスケジュール設定を取得
-    existing = scheduler_client.get_schedule(
-        Name=schedule_name,
-        GroupName=group_name
-    )
-
     # at() 形式でスケジュール式を作成
     at_expression = f"at({next_datetime.strftime('%Y-%m-%dT%H:%M:%S')})"
 
-    # Target をコピーして更新
-    target = existing['Target'].copy()
-
-    # next_input が指定されている場合、Target.Input 内の Payload.input を更新
-    if next_input is not None:
-        # Target.Input は二重にJSON化されている構造:
-        # { "AgentRuntimeArn": "...", "Payload": "{\"action\":\"start\",\"input\":\"...\"}" }
-        original_input = json.loads(target['Input'])
-        payload = json.loads(original_input['Payload'])
-        payload['input'] = next_input
-        original_input['Payload'] = json.dumps(payload, ensure_ascii=False)
-        target['Input'] = json.dumps(original_input, ensure_ascii=False)
-
-    # 更新パラメータを構築（既存設定を保持）
-    update_params = {
-        'Name': schedule_name,
-        'GroupName': group_name,
-        'ScheduleExpression': at_expression,
-        'ScheduleExpressionTimezone': timezone,
-        'FlexibleTimeWindow': existing['FlexibleTimeWindow'],
-        'Target': target,
-    }
-
-    # オプションフィールドを保持
-    optional_fields = ['Description', 'EndDate', 'StartDate', 'State', 'KmsKeyArn', 'ActionAfterCompletion']
-    for field in optional_fields:
-        if field in existing and existing[field] is not None:
-            update_params[field] = existing[field]
-
-    # スケジュールを更新
-    response = scheduler_client.update_schedule(**update_params)
+    scheduler_client = await get_client('scheduler')
+    cache_key = (schedule_name, group_name)
+    for attempt in range(2):
+        # 既存のスケジュール設定を取得（キャッシュにあれば get_schedule を省略）
+        existing = _SCHED_CACHE.get(cache_key)
+        if existing is None:
+            existing = await scheduler_client.get_schedule(
+                Name=schedule_name,
+                GroupName=group_name
+            )
+            _SCHED_CACHE[cache_key] = existing
+
+        # Target をコピーして更新
+        target = existing['Target'].copy()
+
+        # next_input が指定されている場合、Target.Input 内の Payload.input を更新
+        if next_input is not None:
+            # Target.Input は二重にJSON化されている構造:
+            # { "AgentRuntimeArn": "...", "Payload": "{\"action\":\"start\",\"input\":\"...\"}" }
+            original_input = orjson.loads(target['Input'])
+            payload = orjson.loads(original_input['Payload'])
+            payload['input'] = next_input
+            original_input['Payload'] = orjson.dumps(payload).decode()
+            target['Input'] = orjson.dumps(original_input).decode()
+
+        # 更新パラメータを構築（既存設定を保持）
+        update_params = {
+            'Name': schedule_name,
+            'GroupName': group_name,
+            'ScheduleExpression': at_expression,
+            'ScheduleExpressionTimezone': timezone,
+            'FlexibleTimeWindow': existing['FlexibleTimeWindow'],
+            'Target': target,
+        }
+
+        # オプションフィールドを保持
+        optional_fields = ['Description', 'EndDate', 'StartDate', 'State', 'KmsKeyArn', 'ActionAfterCompletion']
+        for field in optional_fields:
+            if field in existing and existing[field] is not None:
+                update_params[field] = existing[field]
+
+        # スケジュールを更新（キャッシュが古い場合は破棄して1回だけ再試行）
+        try:
+            response = await scheduler_client.update_schedule(**update_params)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in _SCHED_STALE_CODES:
+                raise
+            _SCHED_CACHE.pop(cache_key, None)
+            if attempt > 0:
+                raise
+            continue
+        break
+
+    # キャッシュを更新後の内容に合わせる
+    existing['ScheduleExpression'] = at_expression
+    existing['ScheduleExpressionTimezone'] = timezone
+    existing['Target'] = target
 
     return {
         'schedule_arn': response['ScheduleArn'],
@@ -116,26 +153,40 @@ async def http_get(url: str, timeout_sec: int = 10, max_bytes: int = 50_000) ->
     Returns:
         Response text (truncated to max_bytes)
     """
-    async with httpx.AsyncClient(timeout=timeout_sec, follow_redirects=True, headers={
-        "User-Agent": "AgentCore-Strands-MVP/1.0"
-    }) as client:
-        r = await client.get(url)
+    # 本文全体をバッファせず、max_bytes に達した時点で読み込みを打ち切る
+    async with _HTTP.stream("GET", url, timeout=timeout_sec) as r:
         r.raise_for_status()
-        content = r.text
-        if len(content) > max_bytes:
-            content = content[:max_bytes] + "\n...[truncated]..."
-        return content
+        buf = bytearray()
+        truncated = False
+        async for chunk in r.aiter_bytes(8192):
+            if len(buf) >= max_bytes:
+                # 上限に達した後もまだ本文が残っている
+                truncated = True
+                break
+            buf.extend(chunk)
+        if len(buf) > max_bytes:
+            truncated = True
+        content = buf[:max_bytes].decode(r.encoding or "utf-8", errors="replace")
+    if truncated:
+        content += "\n...[truncated]..."
+    return content
 
 @tool
 async def sleep_seconds(seconds: int = 3) -> str:
     """Sleep for N seconds, then report how long we slept."""
-    await asyncio.sleep(max(0, int(seconds)))
-    return f"Slept {seconds} seconds"
+    try:
+        s = int(seconds)
+    except (TypeError, ValueError):
+        raise ValueError(f"seconds must be an integer, got: {seconds!r}")
+    if s <= 0:
+        return "Slept 0 seconds"
+    await asyncio.sleep(s)
+    return f"Slept {s} seconds"
 
 @tool
 def current_time(tz: str = "Asia/Tokyo") -> str:
     """Return the current time in ISO8601 for the given timezone."""
-    return datetime.now(ZoneInfo(tz)).isoformat()
+    return datetime.now(_zi(tz)).isoformat()
 
 
 @tool
@@ -160,7 +211,7 @@ async def update_next_schedule(
         Confirmation message with the updated schedule details
     """
     try:
-        tz = ZoneInfo(timezone)
+        tz = _zi(timezone)
         now = datetime.now(tz)
 
         # next_execution をパース（ISO8601形式または相対形式）
@@ -177,8 +228,8 @@ async def update_next_schedule(
         if next_dt <= now:
             return f"Error: Next execution time must be in the future. Provided: {next_dt.isoformat()}, Current: {now.isoformat()}"
 
-        # スレッドプールで同期的なboto3呼び出しを実行
-        result = await asyncio.to_thread(_update_schedule_sync, next_dt, timezone, next_input)
+        # 非同期クライアントで EventBridge Scheduler を更新
+        result = await _update_schedule(next_dt, timezone, next_input)
 
         response_parts = [
             "Schedule updated successfully!",